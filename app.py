@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
+import csv
+import io
 import re
-import pandas as pd
 import streamlit as st
+from openpyxl import load_workbook
 
 # =========================
 # 固定セルの定義（0始まり）
@@ -16,53 +18,69 @@ FIXPOS = {
     "SHORT_TITLE": (40, 1) # 短縮版タイトル: B41
 }
 
+# 読み込む範囲（1始まり・行3～41、列A～E）
+MIN_ROW = min(r for r, _ in FIXPOS.values()) + 1
+MAX_ROW = max(r for r, _ in FIXPOS.values()) + 1
+MAX_COL = max(c for _, c in FIXPOS.values()) + 1
+
+CSV_FIELDS = ["length", "idea_no", "text", "writer", "used_title"]
+
 LATIN = re.compile(r"[A-Za-z]")
+PAREN_ANY = re.compile(r"\s*[（(][^）)]*[）)]\s*")
+# 出演者の区切り文字（空白に置き換えて str.split で分割する）
+CAST_DELIM_TRANS = str.maketrans({c: " " for c in "、，,/／・"})
 
 # =========================
 # ユーティリティ
 # =========================
-def get_cell(df: pd.DataFrame, pos):
-    r, c = pos
+def read_fixed_range(file) -> dict:
+    """先頭シートの固定セル範囲だけを読み込み {(行, 列): 値}（0始まり）で返す"""
+    wb = load_workbook(file, read_only=True, data_only=True)
     try:
-        v = str(df.iat[r, c]).strip()
-        return "" if v.lower() == "nan" else v
-    except Exception:
-        return ""
+        ws = wb.worksheets[0]
+        cells = {}
+        rows = ws.iter_rows(min_row=MIN_ROW, max_row=MAX_ROW, max_col=MAX_COL, values_only=True)
+        for r, row in enumerate(rows, start=MIN_ROW - 1):
+            for c, v in enumerate(row):
+                cells[(r, c)] = v
+        return cells
+    finally:
+        wb.close()
+
+def get_cell(cells: dict, pos):
+    v = cells.get(pos)
+    return "" if v is None else str(v).strip()
+
+@st.cache_data(show_spinner=False)
+def load_fixed_cells(file_bytes: bytes) -> dict:
+    """固定セルの値を {FIXPOSのキー: 文字列} で返す（同じファイルは再解析しない）"""
+    cells = read_fixed_range(io.BytesIO(file_bytes))
+    return {key: get_cell(cells, pos) for key, pos in FIXPOS.items()}
 
 def prefer_latin_title(title_raw: str) -> str:
     """英字があればそのまま、括弧付き読み仮名は削除"""
     s = (title_raw or "").strip()
     if not s:
         return s
-    if LATIN.search(s):
-        s = re.sub(r"[（(][^）)]*[）)]\s*$", "", s).strip()
-        s = re.sub(r"\s*[（(][^）)]*[）)]\s*", " ", s).strip()
+    # 括弧がなければ置換は空振りなので正規表現を通さない
+    if LATIN.search(s) and ("（" in s or "(" in s):
+        # 末尾の括弧は置換後の空白ごと strip で消える
+        s = PAREN_ANY.sub(" ", s).strip()
     return s
 
-def normalize_cast(cast_text: str) -> str:
-    parts = re.split(r"[、，,/／・\s]+", (cast_text or "").strip())
-    return "、".join([p for p in parts if p])
-
-def cast_first_n(cast: str, n: int) -> str:
-    if not cast:
-        return ""
-    arr = [a for a in re.split(r"[、，,/／・\s]+", cast) if a]
-    return "、".join(arr[:n])
-
-def trim_to_len(s: str, n: int) -> str:
-    return "" if n <= 0 else (s if len(s) <= n else s[:n])
-
-def compose_text(title: str, cast: str, marks: dict) -> str:
-    """マーク＋タイトル＋出演者"""
-    head = ""
-    if marks.get("字"): head += "字"
-    if marks.get("デ"): head += "デ"
-    title_prefix = "新" if marks.get("新") else ""
-    title_suffix = "終" if marks.get("終") else ""
-    core = f"{title_prefix}{title}{title_suffix}"
-    if cast:
-        core += f"{cast}"
-    return f"{head}{core}"
+def parse_cast(cast_text: str) -> list:
+    """出演者欄を名前のリストに分割"""
+    return (cast_text or "").translate(CAST_DELIM_TRANS).split()
+
+def cast_join(tokens: list) -> str:
+    return "、".join(tokens)
+
+def cast_first_n(tokens: list, n: int) -> str:
+    return cast_join(tokens[:n])
+
+def compose_text(title: str, cast: str, head: str, prefix: str, suffix: str) -> str:
+    """マーク＋タイトル＋出演者（マーク部分は呼び出し側で組み立て済み）"""
+    return head + prefix + title + suffix + cast
 
 def pick_title_for_length(L: int, main_title: str, short_title: str) -> str:
     """10文字以下なら短縮版を優先（空なら正式タイトル）"""
@@ -70,19 +88,22 @@ def pick_title_for_length(L: int, main_title: str, short_title: str) -> str:
         return short_title
     return main_title
 
-def generate_ideas(main_title: str, short_title: str, cast: str, marks: dict, length: int):
-    title_for_L = pick_title_for_length(length, main_title, short_title)
-    ideas_raw = [
-        compose_text(title_for_L, cast, marks),
-        compose_text(title_for_L, cast_first_n(cast, 2), marks),
-        compose_text(title_for_L, "", marks),
-    ]
-    out = []
-    for x in ideas_raw:
-        t = trim_to_len(x, length)
-        if t and t not in out:
-            out.append(t)
-    return out
+def build_candidates(title: str, cast_tokens: list, head: str, prefix: str, suffix: str) -> tuple:
+    """文字数に依存しない候補（全出演者・先頭2名・出演者なし）"""
+    return (
+        compose_text(title, cast_join(cast_tokens), head, prefix, suffix),
+        compose_text(title, cast_first_n(cast_tokens, 2), head, prefix, suffix),
+        compose_text(title, "", head, prefix, suffix),
+    )
+
+def trim_candidates(cands: tuple, length: int):
+    """文字数に合わせて切り詰め、空と重複を除く（順序は維持）"""
+    if length <= 0:
+        return []
+    # 先頭（全出演者）が最長なので、それが収まれば切り詰め不要
+    if len(cands[0]) > length:
+        cands = (x if len(x) <= length else x[:length] for x in cands)
+    return list(dict.fromkeys(t for t in cands if t))
 
 # =========================
 # Streamlit UI
@@ -116,18 +137,19 @@ if st.button("ラテ欄作成", type="primary"):
         st.stop()
 
     try:
-        df = pd.read_excel(uploaded, sheet_name=0, header=None)
+        fixed = load_fixed_cells(uploaded.getvalue())
     except Exception as e:
         st.error(f"読み込み失敗: {e}")
         st.stop()
 
-    main_title = prefer_latin_title(get_cell(df, FIXPOS["TITLE"]))
-    cast = normalize_cast(get_cell(df, FIXPOS["CAST"]))
-    date_l, date_r = get_cell(df, FIXPOS["DATE_L"]), get_cell(df, FIXPOS["DATE_R"])
-    time_l, time_r = get_cell(df, FIXPOS["TIME_L"]), get_cell(df, FIXPOS["TIME_R"])
+    main_title = prefer_latin_title(fixed["TITLE"])
+    cast_tokens = parse_cast(fixed["CAST"])
+    cast = cast_join(cast_tokens)
+    date_l, date_r = fixed["DATE_L"], fixed["DATE_R"]
+    time_l, time_r = fixed["TIME_L"], fixed["TIME_R"]
 
     # 短縮版（UI入力 > B41 > 正式タイトル）
-    short_title = short_title_override.strip() if short_title_override else get_cell(df, FIXPOS["SHORT_TITLE"])
+    short_title = short_title_override.strip() if short_title_override else fixed["SHORT_TITLE"]
 
     st.subheader("結果表示")
     st.write("**① 正式タイトル**：", main_title or "（不明）")
@@ -139,22 +161,38 @@ if st.button("ラテ欄作成", type="primary"):
 
     st.markdown("**⑤ 文字数パターン別ラテ欄アイデア**（10文字以下なら短縮版）")
     out_rows = []
+    # マークと候補は文字数に依存しないため、使うタイトルごとに一度だけ組み立てる
+    head = ("字" if marks["字"] else "") + ("デ" if marks["デ"] else "")
+    prefix = "新" if marks["新"] else ""
+    suffix = "終" if marks["終"] else ""
+    cands_by_title = {
+        t: build_candidates(t, cast_tokens, head, prefix, suffix)
+        for t in {main_title, short_title}
+    }
+    lines = []
     for L in lengths:
-        ideas = generate_ideas(main_title, short_title, cast, marks, L)
-        st.markdown(f"- **{L}文字**")
+        used_title = pick_title_for_length(L, main_title, short_title)
+        ideas = trim_candidates(cands_by_title[used_title], L)
+        lines.append(f"- **{L}文字**")
         for idx, idea in enumerate(ideas, start=1):
-            st.write(f"　案{idx}: {idea}")
+            lines.append(f"  - 案{idx}: {idea}")
             out_rows.append({
                 "length": L,
                 "idea_no": idx,
                 "text": idea,
                 "writer": writer_input,
-                "used_title": pick_title_for_length(L, main_title, short_title)
+                "used_title": used_title
             })
+    # 表示は1回の描画にまとめる
+    if lines:
+        st.markdown("\n".join(lines))
 
     if out_rows:
-        out_df = pd.DataFrame(out_rows)
+        buf = io.StringIO()
+        w = csv.DictWriter(buf, fieldnames=CSV_FIELDS, lineterminator="\n")
+        w.writeheader()
+        w.writerows(out_rows)
         st.download_button("CSVでダウンロード",
-                           out_df.to_csv(index=False).encode("utf-8-sig"),
+                           buf.getvalue().encode("utf-8-sig"),
                            "latekans.csv",
                            "text/csv")